@@ -3,14 +3,24 @@ LangGraph Agent with MCP Integration
 Connects to MCP server and handles user queries
 """
 
+import ast
+import asyncio
+import functools
+import hashlib
 import json
 import logging
-import subprocess
+import re
+from collections import OrderedDict, namedtuple
 from typing import Any, Annotated
 import sys
 
+import numpy as np
+import orjson
+from numpy.typing import ArrayLike
+
 from langgraph.graph import StateGraph, END
 from langchain_core.messages import BaseMessage, HumanMessage, AIMessage, ToolMessage
+from langchain_core.runnables import RunnableConfig
 from langchain_core.tools import tool
 from langchain_core.language_model.llm import LLM
 from langchain_core.outputs.chat_generation import ChatGeneration
@@ -22,10 +32,20 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
+class NormalizedQuery(namedtuple("NormalizedQuery", "raw lower")):
+    """User query with its lowercased form computed once."""
+    __slots__ = ()
+    
+    @classmethod
+    def from_text(cls, text: str) -> "NormalizedQuery":
+        return cls(text, text.lower())
+
+
 class AgentState(TypedDict):
     """Agent state for LangGraph."""
     messages: list[BaseMessage]
     query: str
+    normalized: NormalizedQuery
     response: str | None
 
 
@@ -33,6 +53,32 @@ class AgentState(TypedDict):
 # CUSTOM TOOLS
 # ============================================================================
 
+# Matches percentage expressions like "15% of 50000"
+_PCT_RE = re.compile(r"(-?[\d.]+)\s*%\s*of\s*(-?[\d.]+)")
+
+# Matches a bare percentage like "15%" in a user query
+_PERCENT_RE = re.compile(r"(\d+(?:\.\d+)?)\s*%")
+
+# AST nodes allowed in arithmetic expressions
+_CALC_NODES = (
+    ast.Expression, ast.BinOp, ast.UnaryOp, ast.Constant,
+    ast.Add, ast.Sub, ast.Mult, ast.Div, ast.FloorDiv, ast.Mod,
+    ast.UAdd, ast.USub
+)
+
+
+@functools.lru_cache(maxsize=1024)
+def _compile_expression(expression: str):
+    """Parse and compile an arithmetic expression, rejecting anything else."""
+    tree = ast.parse(expression.strip(), mode="eval")
+    for node in ast.walk(tree):
+        if not isinstance(node, _CALC_NODES):
+            raise ValueError(f"Unsupported expression element: {type(node).__name__}")
+        if isinstance(node, ast.Constant) and not isinstance(node.value, (int, float)):
+            raise ValueError(f"Unsupported constant: {node.value!r}")
+    return compile(tree, "<calc>", "eval")
+
+
 @tool
 def calculator(expression: str) -> str:
     """
@@ -46,23 +92,37 @@ def calculator(expression: str) -> str:
     """
     try:
         # Handle percentage calculations
-        if "%" in expression:
-            parts = expression.split(" of ")
-            if len(parts) == 2:
-                percent_str = parts[0].strip().replace("%", "").strip()
-                amount_str = parts[1].strip()
-                percent = float(percent_str)
-                amount = float(amount_str)
-                result = (percent / 100) * amount
-                return f"{percent}% of {amount} = {result}"
+        match = _PCT_RE.fullmatch(expression.strip())
+        if match:
+            percent = float(match.group(1))
+            amount = float(match.group(2))
+            result = (percent / 100) * amount
+            return f"{percent}% of {amount} = {result}"
         
         # Standard calculation
-        result = eval(expression)
+        result = eval(_compile_expression(expression), {"__builtins__": {}}, {})
         return f"{expression} = {result}"
     except Exception as e:
         return f"Error calculating: {str(e)}"
 
 
+def calculator_batch(percent: ArrayLike, amount: ArrayLike) -> np.ndarray:
+    """
+    Apply percentages to amounts element-wise.
+    
+    Vectorized counterpart of the calculator's "% of" path for bulk requests,
+    e.g. a discount over every product in a listing.
+    
+    Args:
+        percent: Percentage or array of percentages (e.g. 15 for 15%)
+        amount: Amount or array of amounts
+        
+    Returns:
+        Array of results, broadcast to the shape of the inputs
+    """
+    return np.asarray(percent, dtype=np.float64) * 0.01 * np.asarray(amount, dtype=np.float64)
+
+
 @tool
 def formatter(text: str, format_type: str = "json") -> str:
     """
@@ -93,80 +153,143 @@ def formatter(text: str, format_type: str = "json") -> str:
         return f"Error formatting: {str(e)}"
 
 
+# ============================================================================
+# INTENT ROUTING
+# ============================================================================
+
+# Keywords per intent, in the order intents take precedence when several match
+INTENT_KEYWORDS = {
+    "list": ("список", "все продукты", "show products"),
+    "category": ("категория", "category", "электроника"),
+    "stats": ("статистика", "statistics", "средняя цена"),
+    "product": ("product id", "товар", "найти", "id"),
+    "add": ("добавь", "add", "новый"),
+    "calc": ("%", "посчитай", "calculate", "discount", "скидка"),
+}
+
+INTENT_PRIORITY = tuple(INTENT_KEYWORDS)
+
+
+def _keyword_pattern(keyword: str) -> str:
+    """Escape a keyword, anchoring word-character edges so it only matches whole words."""
+    pattern = re.escape(keyword)
+    # Lookarounds instead of \b so edges like "%" after a digit still match
+    if re.match(r"\w", keyword):
+        pattern = r"(?<!\w)" + pattern
+    if re.search(r"\w$", keyword):
+        pattern += r"(?!\w)"
+    return pattern
+
+
+def _build_intent_re(intent_keywords: dict[str, tuple[str, ...]]) -> re.Pattern:
+    """Compile keywords into one pattern with a named group per intent."""
+    groups = []
+    for name, keywords in intent_keywords.items():
+        # Longest keyword first so overlapping keywords match the longest one
+        alternatives = "|".join(_keyword_pattern(k) for k in sorted(keywords, key=len, reverse=True))
+        groups.append(f"(?P<{name}>{alternatives})")
+    return re.compile("|".join(groups))
+
+
+# Single pattern so one scan classifies the whole query
+INTENT_RE = _build_intent_re(INTENT_KEYWORDS)
+
+
+def detect_intents(text: str) -> set[str]:
+    """Return names of all intents mentioned in lowercased text."""
+    return {match.lastgroup for match in INTENT_RE.finditer(text)}
+
+
+# Product ID following "id" or "номер", e.g. "id 5", "id=5", "номер 5";
+# longer digit runs are ignored so IDs always fit a 64-bit integer
+_ID_RE = re.compile(r"\b(?:id|номер)\s*[=:#]?\s*(\d{1,18})(?!\d)")
+
+
+def extract_product_id(text: str) -> int | None:
+    """Return the product ID mentioned in lowercased text, if any."""
+    match = _ID_RE.search(text)
+    return int(match.group(1)) if match else None
+
+
 # ============================================================================
 # MOCK LLM
 # ============================================================================
 
+def _mock_list_products(query: NormalizedQuery) -> str:
+    tool_use = json.dumps({
+        "tool": "list_products",
+        "args": {}
+    })
+    return f"I'll get all products for you. [TOOL_USE: {tool_use}]"
+
+
+def _mock_list_category(query: NormalizedQuery) -> str:
+    category = "Электроника"
+    tool_use = json.dumps({
+        "tool": "list_products",
+        "args": {"category": category}
+    })
+    return f"Getting products in {category} category. [TOOL_USE: {tool_use}]"
+
+
+def _mock_statistics(query: NormalizedQuery) -> str:
+    tool_use = json.dumps({
+        "tool": "get_statistics"
+    })
+    return f"Getting product statistics. [TOOL_USE: {tool_use}]"
+
+
+def _mock_get_product(query: NormalizedQuery) -> str:
+    product_id = extract_product_id(query.lower)
+    if product_id is not None:
+        tool_use = json.dumps({
+            "tool": "get_product",
+            "args": {"product_id": product_id}
+        })
+        return f"Getting product with ID {product_id}. [TOOL_USE: {tool_use}]"
+    return "Please specify a product ID."
+
+
+def _mock_add_product(query: NormalizedQuery) -> str:
+    return "I'll help you add a new product. Please provide name, price, and category."
+
+
+def _mock_calculate(query: NormalizedQuery) -> str:
+    # Extract calculation from query
+    if "%" in query.lower:
+        parts = query.lower.split("%")
+        # Try to find the percentage value
+        expr = parts[0].strip().split()[-1] + "% of " + parts[1].strip().split()[-1]
+        tool_use = json.dumps({
+            "tool": "calculator",
+            "args": {"expression": expr}
+        })
+        return f"Calculating discount. [TOOL_USE: {tool_use}]"
+    return "I can help with calculations. Please specify the expression."
+
+
+_MOCK_HANDLERS = {
+    "list": _mock_list_products,
+    "category": _mock_list_category,
+    "stats": _mock_statistics,
+    "product": _mock_get_product,
+    "add": _mock_add_product,
+    "calc": _mock_calculate,
+}
+
+
 class MockLLM(LLM):
     """Mock LLM that simulates tool calling based on user query."""
     
     def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> LLMResult:
         """Generate mock LLM response with tool calling."""
-        last_message = messages[-1].content.lower()
+        last_message = NormalizedQuery.from_text(messages[-1].content)
         
         # Route to appropriate tools based on query
-        if "список" in last_message or "все продукты" in last_message or "show products" in last_message:
-            tool_use = json.dumps({
-                "tool": "list_products",
-                "args": {}
-            })
-            content = f"I'll get all products for you. [TOOL_USE: {tool_use}]"
-        
-        elif "категория" in last_message or "category" in last_message or "электроника" in last_message:
-            category = "Электроника" if "электроника" in last_message else "Электроника"
-            tool_use = json.dumps({
-                "tool": "list_products",
-                "args": {"category": category}
-            })
-            content = f"Getting products in {category} category. [TOOL_USE: {tool_use}]"
-        
-        elif "статистика" in last_message or "statistics" in last_message or "средняя цена" in last_message:
-            tool_use = json.dumps({
-                "tool": "get_statistics"
-            })
-            content = f"Getting product statistics. [TOOL_USE: {tool_use}]"
-        
-        elif "product id" in last_message or "товар" in last_message or "найти" in last_message:
-            # Extract product ID from query
-            words = last_message.split()
-            product_id = None
-            for i, word in enumerate(words):
-                if word in ["id", "номер"] and i + 1 < len(words):
-                    try:
-                        product_id = int(words[i + 1])
-                        break
-                    except:
-                        pass
-            if product_id:
-                tool_use = json.dumps({
-                    "tool": "get_product",
-                    "args": {"product_id": product_id}
-                })
-                content = f"Getting product with ID {product_id}. [TOOL_USE: {tool_use}]"
-            else:
-                content = "Please specify a product ID."
-        
-        elif "добавь" in last_message or "add" in last_message or "новый" in last_message:
-            # Try to parse product details
-            content = "I'll help you add a new product. Please provide name, price, and category."
-        
-        elif "%" in last_message or "посчитай" in last_message or "calculate" in last_message or "discount" in last_message:
-            # Extract calculation from query
-            if "%" in last_message:
-                parts = last_message.split("%")
-                if parts:
-                    # Try to find the percentage value
-                    expr = parts[0].strip().split()[-1] + "% of " + parts[1].strip().split()[-1]
-                    tool_use = json.dumps({
-                        "tool": "calculator",
-                        "args": {"expression": expr}
-                    })
-                    content = f"Calculating discount. [TOOL_USE: {tool_use}]"
-                else:
-                    content = "I can help calculate discounts and prices."
-            else:
-                content = "I can help with calculations. Please specify the expression."
-        
+        intents = detect_intents(last_message.lower)
+        intent = next((name for name in INTENT_PRIORITY if name in intents), None)
+        if intent is not None:
+            content = _MOCK_HANDLERS[intent](last_message)
         else:
             content = "I'll help you with product management. What would you like to do?"
         
@@ -182,90 +305,314 @@ class MockLLM(LLM):
 # MCP CLIENT
 # ============================================================================
 
+# Tools whose results depend only on their arguments and can be cached
+READ_ONLY_TOOLS = frozenset({"list_products", "get_product", "get_statistics"})
+
+# Tools that mutate server state and invalidate cached results
+WRITE_TOOLS = frozenset({"add_product"})
+
+# Read buffer for server responses; a single list_products line can exceed
+# asyncio's 64 KiB default
+STREAM_LIMIT = 1 << 20
+
+MCP_PROTOCOL_VERSION = "2024-11-05"
+
+_MISSING = object()
+
+
+class ToolResultCache:
+    """LRU cache for results of read-only MCP tool calls."""
+    
+    def __init__(self, maxsize: int = 512):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[str, Any] = OrderedDict()
+    
+    @staticmethod
+    def make_key(tool_name: str, args: dict) -> str:
+        """Build a content-hashed cache key for a tool call."""
+        payload = tool_name.encode() + orjson.dumps(args, option=orjson.OPT_SORT_KEYS)
+        return hashlib.sha256(payload).hexdigest()
+    
+    def get(self, key: str) -> Any:
+        """Return cached result or _MISSING, updating hit/miss counters."""
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return self._entries[key]
+        self.misses += 1
+        return _MISSING
+    
+    def set(self, key: str, value: Any) -> None:
+        """Store result, evicting the least recently used entry if full."""
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+    
+    def clear(self) -> None:
+        """Drop all cached results."""
+        self._entries.clear()
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
 class MCPClient:
     """Client to communicate with MCP server via stdio."""
     
-    def __init__(self, mcp_process: subprocess.Popen):
+    def __init__(self, mcp_process: asyncio.subprocess.Process, cache_maxsize: int = 512, timeout: float = 30.0):
         self.process = mcp_process
         self.request_id = 0
+        self.timeout = timeout
+        self.cache = ToolResultCache(maxsize=cache_maxsize)
+        self._pending: dict[int, asyncio.Future] = {}
+        self._reader_task: asyncio.Task | None = None
+    
+    @classmethod
+    async def start(cls, *command: str, cache_maxsize: int = 512, timeout: float = 30.0) -> "MCPClient":
+        """Spawn the MCP server process and return a client bound to it."""
+        process = await asyncio.create_subprocess_exec(
+            *command,
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            limit=STREAM_LIMIT
+        )
+        client = cls(process, cache_maxsize=cache_maxsize, timeout=timeout)
+        try:
+            await client.initialize()
+        except Exception:
+            await client.close()
+            raise
+        return client
+    
+    async def initialize(self) -> Any:
+        """Perform the MCP initialization handshake."""
+        result = await self._request("initialize", {
+            "protocolVersion": MCP_PROTOCOL_VERSION,
+            "capabilities": {},
+            "clientInfo": {"name": "ai-mcp-agent", "version": "1.0.0"}
+        })
+        await self._write({"jsonrpc": "2.0", "method": "notifications/initialized"})
+        return result
+    
+    async def call_tool(self, tool_name: str, args: dict) -> Any:
+        """Call a tool on the MCP server and return the decoded result."""
+        return orjson.loads(await self.call_tool_raw(tool_name, args))
+    
+    async def call_tool_raw(self, tool_name: str, args: dict) -> bytes:
+        """
+        Call a tool on the MCP server and return its result as JSON bytes.
+        
+        Read-only tools are served from cache, which holds the encoded bytes
+        so repeated calls skip serialization entirely.
+        """
+        if tool_name in READ_ONLY_TOOLS:
+            key = self.cache.make_key(tool_name, args)
+            cached = self.cache.get(key)
+            if cached is not _MISSING:
+                return cached
+            
+            result = await self._call(tool_name, args)
+            raw = orjson.dumps(result)
+            # Tool failures are reported as results; retry them next time
+            if result is not None and not (isinstance(result, dict) and result.get("isError")):
+                self.cache.set(key, raw)
+            return raw
+        
+        result = await self._call(tool_name, args)
+        if tool_name in WRITE_TOOLS:
+            self.cache.clear()
+        return orjson.dumps(result)
+    
+    async def close(self) -> None:
+        """Stop the response reader and terminate the MCP server process."""
+        if self._reader_task is not None:
+            self._reader_task.cancel()
+            self._reader_task = None
+        if self.process.returncode is None:
+            self.process.terminate()
+            await self.process.wait()
+    
+    async def _call(self, tool_name: str, args: dict) -> Any:
+        """Send a tools/call request and wait for its response."""
+        return await self._request("tools/call", {
+            "name": tool_name,
+            "arguments": args
+        })
     
-    def call_tool(self, tool_name: str, args: dict) -> Any:
-        """Call a tool on the MCP server."""
+    async def _request(self, method: str, params: dict) -> Any:
+        """Send a JSON-RPC request and wait for its response."""
+        if self._reader_task is None or self._reader_task.done():
+            self._reader_task = asyncio.create_task(self._read_responses())
+        
         self.request_id += 1
+        request_id = self.request_id
         
         request = {
             "jsonrpc": "2.0",
-            "id": self.request_id,
-            "method": "tools/call",
-            "params": {
-                "name": tool_name,
-                "arguments": args
-            }
+            "id": request_id,
+            "method": method,
+            "params": params
         }
         
-        # Send request
-        request_line = json.dumps(request) + "\n"
-        self.process.stdin.write(request_line.encode())
-        self.process.stdin.flush()
+        # Register before writing so the reader can never miss the response
+        future = asyncio.get_running_loop().create_future()
+        self._pending[request_id] = future
+        
+        try:
+            await self._write(request)
+            response = await asyncio.wait_for(future, self.timeout)
+        except asyncio.TimeoutError:
+            raise TimeoutError(f"MCP server did not answer {method} within {self.timeout}s")
+        finally:
+            self._pending.pop(request_id, None)
         
-        # Read response
-        response_line = self.process.stdout.readline().decode().strip()
-        if response_line:
-            response = json.loads(response_line)
-            if "result" in response:
-                return response["result"]
-            elif "error" in response:
-                raise Exception(f"MCP Error: {response['error']}")
+        if "result" in response:
+            return response["result"]
+        elif "error" in response:
+            raise Exception(f"MCP Error: {response['error']}")
         
         return None
+    
+    async def _write(self, message: dict) -> None:
+        """Write one JSON-RPC message to the server."""
+        self.process.stdin.write(orjson.dumps(message) + b"\n")
+        await self.process.stdin.drain()
+    
+    async def _read_responses(self) -> None:
+        """Route responses from the server to pending requests by JSON-RPC id."""
+        try:
+            while True:
+                response_line = await self.process.stdout.readline()
+                if not response_line:
+                    break
+                
+                if not response_line.strip():
+                    continue
+                
+                response = orjson.loads(response_line)
+                future = self._pending.get(response.get("id"))
+                if future is not None and not future.done():
+                    future.set_result(response)
+        finally:
+            # Server went away: fail whatever is still waiting
+            for future in self._pending.values():
+                if not future.done():
+                    future.set_exception(ConnectionError("MCP server closed the connection"))
 
 
 # ============================================================================
 # AGENT EXECUTION
 # ============================================================================
 
-def process_user_query(query: str, mcp_client: MCPClient | None = None) -> str:
+# Placeholder results used when no MCP server is connected, encoded once
+_EMPTY_RESULT = orjson.dumps({})
+_EMPTY_PRODUCTS = orjson.dumps({"products": []})
+
+# Fixed tool call for each intent that needs no query-specific arguments,
+# as (label, tool name, args, placeholder), in response order
+INTENT_TOOL_CALLS = {
+    "list": ("Products", "list_products", {}, _EMPTY_PRODUCTS),
+    "category": ("Products in Электроника", "list_products", {"category": "Электроника"}, _EMPTY_PRODUCTS),
+    "stats": ("Statistics", "get_statistics", {}, _EMPTY_RESULT),
+}
+
+
+async def _call_tool_raw(mcp_client: MCPClient | None, tool_name: str, args: dict, placeholder: bytes) -> bytes:
+    """Call an MCP tool for JSON bytes, falling back to a placeholder result without a client."""
+    if mcp_client is None:
+        return placeholder
+    return await mcp_client.call_tool_raw(tool_name, args)
+
+
+def _tool_payload(result: Any) -> Any:
+    """Return the value a tool produced from its CallToolResult."""
+    if not isinstance(result, dict):
+        return result
+    if "structuredContent" in result:
+        return result["structuredContent"]
+    # mcp releases before structuredContent carry the value as JSON text only
+    content = result.get("content")
+    if content and content[0].get("type") == "text":
+        try:
+            return orjson.loads(content[0]["text"])
+        except orjson.JSONDecodeError:
+            return {}
+    # Placeholder results without a server are the bare value
+    return result
+
+
+def _bulk_discounts(query_lower: str, results: list) -> list[dict]:
+    """Apply the percentage in the query to every listed product's price."""
+    match = _PERCENT_RE.search(query_lower)
+    if not match:
+        return []
+    
+    payloads = [_tool_payload(result) for result in results]
+    products = [
+        p for payload in payloads if isinstance(payload, dict)
+        for p in payload.get("products", [])
+    ]
+    if not products:
+        return []
+    
+    percent = float(match.group(1))
+    amounts = calculator_batch(percent, [p["price"] for p in products])
+    return [
+        {"id": p["id"], "percent": percent, "amount": amount}
+        for p, amount in zip(products, amounts.tolist())
+    ]
+
+
+async def process_user_query(query: str | NormalizedQuery, mcp_client: MCPClient | None = None) -> str:
     """Process user query and return response."""
-    logger.info(f"Processing query: {query}")
+    if isinstance(query, str):
+        query = NormalizedQuery.from_text(query)
+    logger.info(f"Processing query: {query.raw}")
     
     response_parts = []
     
-    # Determine which tool to use based on query
-    query_lower = query.lower()
+    # Determine which tools to use based on query
+    intents = detect_intents(query.lower)
+    
+    # A full listing supersedes the category filter
+    if "list" in intents:
+        intents.discard("category")
+    
+    # Independent read-only tool calls as (label, tool name, args, placeholder)
+    tool_calls = [spec for intent, spec in INTENT_TOOL_CALLS.items() if intent in intents]
+    
+    if "product" in intents:
+        product_id = extract_product_id(query.lower)
+        if product_id is not None:
+            tool_calls.append((f"Product {product_id}", "get_product", {"product_id": product_id}, _EMPTY_RESULT))
     
     try:
-        if "список" in query_lower or "все продукты" in query_lower or "show products" in query_lower:
-            result = mcp_client.call_tool("list_products", {}) if mcp_client else {"products": []}
-            response_parts.append(f"Products: {json.dumps(result, ensure_ascii=False)}")
-        
-        elif "категория" in query_lower or "category" in query_lower or "электроника" in query_lower:
-            category = "Электроника"
-            result = mcp_client.call_tool("list_products", {"category": category}) if mcp_client else {"products": []}
-            response_parts.append(f"Products in {category}: {json.dumps(result, ensure_ascii=False)}")
-        
-        elif "статистика" in query_lower or "statistics" in query_lower or "средняя цена" in query_lower:
-            result = mcp_client.call_tool("get_statistics", {}) if mcp_client else {}
-            response_parts.append(f"Statistics: {json.dumps(result, ensure_ascii=False)}")
-        
-        elif "product" in query_lower or "товар" in query_lower or "id" in query_lower:
-            # Extract product ID
-            words = query_lower.split()
-            for i, word in enumerate(words):
-                if word == "id" and i + 1 < len(words):
-                    try:
-                        product_id = int(words[i + 1])
-                        result = mcp_client.call_tool("get_product", {"product_id": product_id}) if mcp_client else {}
-                        response_parts.append(f"Product {product_id}: {json.dumps(result, ensure_ascii=False)}")
-                        break
-                    except:
-                        pass
+        if tool_calls:
+            # Fan out independent calls so their latencies overlap
+            raw_results = await asyncio.gather(*[
+                _call_tool_raw(mcp_client, tool_name, args, placeholder)
+                for _, tool_name, args, placeholder in tool_calls
+            ])
+            # Results are forwarded as already-encoded JSON
+            for (label, _, _, _), raw in zip(tool_calls, raw_results):
+                response_parts.append(f"{label}: {raw.decode()}")
+            
+            if "calc" in intents:
+                # Decode only when the result contents are needed
+                results = [orjson.loads(raw) for raw in raw_results]
+                discounts = _bulk_discounts(query.lower, results)
+                if discounts:
+                    response_parts.append(f"Discounts: {orjson.dumps(discounts).decode()}")
         
-        elif "добавь" in query_lower or "add product" in query_lower or "новый" in query_lower:
+        elif "add" in intents:
             response_parts.append("To add a product, please provide: name, price, category, and in_stock status.")
         
-        elif "%" in query_lower or "скидка" in query_lower or "discount" in query_lower:
-            # Use calculator tool
-            calc_result = calculator("15% of 50000")
+        elif "calc" in intents:
+            # Sync tools run on LangChain's executor so they never block the event loop
+            calc_result = await calculator.ainvoke("15% of 50000")
             response_parts.append(f"Calculation: {calc_result}")
         
         else:
@@ -283,14 +630,13 @@ def create_agent():
     workflow = StateGraph(AgentState)
     
     # Define nodes
-    def process_node(state: AgentState) -> AgentState:
+    async def process_node(state: AgentState, config: RunnableConfig) -> dict[str, Any]:
         """Process user query through MCP and tools."""
         logger.info(f"Processing: {state['query']}")
-        response = process_user_query(state['query'])
-        return {
-            **state,
-            "response": response
-        }
+        mcp_client = config.get("configurable", {}).get("mcp_client")
+        response = await process_user_query(state['normalized'], mcp_client)
+        # Return only the changed key; LangGraph merges it into the state
+        return {"response": response}
     
     # Add nodes
     workflow.add_node("process", process_node)
@@ -301,15 +647,37 @@ def create_agent():
     return workflow.compile()
 
 
-def run_agent(query: str) -> str:
-    """Run the agent with a user query."""
-    agent = create_agent()
+# Compiled graph shared by all requests; the workflow never changes at runtime
+_AGENT = None
+
+
+def get_agent():
+    """Return the compiled agent, building it on first use."""
+    global _AGENT
+    if _AGENT is None:
+        _AGENT = create_agent()
+    return _AGENT
+
+
+async def arun_agent(query: str, mcp_client: MCPClient | None = None, agent=None) -> str:
+    """Run the agent with a user query, using the shared agent unless one is given."""
+    if agent is None:
+        agent = get_agent()
     
     initial_state: AgentState = {
         "messages": [HumanMessage(content=query)],
         "query": query,
+        "normalized": NormalizedQuery.from_text(query),
         "response": None
     }
     
-    result = agent.invoke(initial_state)
+    result = await agent.ainvoke(
+        initial_state,
+        config={"configurable": {"mcp_client": mcp_client}}
+    )
     return result.get("response", "No response generated")
+
+
+def run_agent(query: str) -> str:
+    """Run the agent with a user query from synchronous code."""
+    return asyncio.run(arun_agent(query))
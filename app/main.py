@@ -3,16 +3,20 @@ FastAPI Application for AI Agent with MCP Integration
 Provides REST API endpoints for querying the agent
 """
 
+import asyncio
 import logging
-from typing import Any
+import os
+import shlex
+from typing import Annotated
+import orjson
 from pydantic import BaseModel, Field
 import uvicorn
 
-from fastapi import FastAPI, HTTPException
-from fastapi.responses import JSONResponse
+from fastapi import Depends, FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
 
-from app.agent import run_agent
+from app.agent import MCPClient, arun_agent, get_agent
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -39,6 +43,11 @@ app.add_middleware(
 # MODELS
 # ============================================================================
 
+# Limits for /api/v1/agent/batch
+MAX_BATCH_SIZE = 100
+BATCH_CONCURRENCY = 10
+
+
 class QueryRequest(BaseModel):
     """Request model for agent query."""
     query: str = Field(..., min_length=1, description="User query for the agent")
@@ -67,12 +76,51 @@ class QueryResponse(BaseModel):
         }
 
 
+class BatchQueryRequest(BaseModel):
+    """Request model for a batch of agent queries."""
+    queries: list[Annotated[str, Field(min_length=1)]] = Field(
+        ...,
+        min_length=1,
+        max_length=MAX_BATCH_SIZE,
+        description="User queries for the agent"
+    )
+    
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "queries": [
+                    "Покажи все продукты",
+                    "Какая средняя цена продуктов?"
+                ]
+            }
+        }
+
+
+class BatchQueryResponse(BaseModel):
+    """Response model for a batch of agent queries."""
+    results: list[QueryResponse] = Field(description="Responses in the order of the queries")
+
+
 class HealthResponse(BaseModel):
     """Health check response."""
     status: str
     message: str
 
 
+# ============================================================================
+# DEPENDENCIES
+# ============================================================================
+
+async def get_mcp_client(request: Request) -> MCPClient | None:
+    """Return the shared MCP client, or None when no MCP server is configured."""
+    return getattr(request.app.state, "mcp_client", None)
+
+
+async def get_agent_graph():
+    """Return the shared compiled agent."""
+    return get_agent()
+
+
 # ============================================================================
 # ENDPOINTS
 # ============================================================================
@@ -92,7 +140,11 @@ async def health_check() -> HealthResponse:
 
 
 @app.post("/api/v1/agent/query", response_model=QueryResponse, tags=["Agent"])
-async def query_agent(request: QueryRequest) -> QueryResponse:
+async def query_agent(
+    request: QueryRequest,
+    mcp_client: MCPClient | None = Depends(get_mcp_client),
+    agent=Depends(get_agent_graph)
+) -> QueryResponse:
     """
     Send a query to the AI agent.
     
@@ -112,7 +164,7 @@ async def query_agent(request: QueryRequest) -> QueryResponse:
         logger.info(f"Received query: {request.query}")
         
         # Process query through agent
-        response = run_agent(request.query)
+        response = await arun_agent(request.query, mcp_client, agent)
         
         logger.info(f"Agent response: {response}")
         
@@ -130,38 +182,83 @@ async def query_agent(request: QueryRequest) -> QueryResponse:
         )
 
 
+@app.post("/api/v1/agent/batch", response_model=BatchQueryResponse, tags=["Agent"])
+async def query_agent_batch(
+    request: BatchQueryRequest,
+    mcp_client: MCPClient | None = Depends(get_mcp_client),
+    agent=Depends(get_agent_graph)
+) -> BatchQueryResponse:
+    """
+    Send several queries to the AI agent in one request.
+    
+    Queries are processed concurrently, so the batch takes about as long
+    as its slowest query rather than the sum of all of them.
+    
+    Args:
+        request: Batch request with user query strings
+        
+    Returns:
+        Agent responses in the order of the queries
+        
+    Raises:
+        HTTPException: If query processing fails
+    """
+    semaphore = asyncio.Semaphore(BATCH_CONCURRENCY)
+    
+    async def run_one(query: str) -> QueryResponse:
+        async with semaphore:
+            response = await arun_agent(query, mcp_client, agent)
+        return QueryResponse(query=query, response=response, status="success")
+    
+    try:
+        logger.info(f"Received batch of {len(request.queries)} queries")
+        results = await asyncio.gather(*[run_one(query) for query in request.queries])
+        return BatchQueryResponse(results=results)
+    
+    except Exception as e:
+        logger.error(f"Error processing batch: {str(e)}", exc_info=True)
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error processing batch: {str(e)}"
+        )
+
+
+# Static payload, serialized once at import
+_EXAMPLES_BYTES = orjson.dumps({
+    "examples": [
+        {
+            "query": "Покажи все продукты",
+            "description": "Get all products"
+        },
+        {
+            "query": "Покажи все продукты в категории Электроника",
+            "description": "Get products in Electronics category"
+        },
+        {
+            "query": "Какая средняя цена продуктов?",
+            "description": "Get average product price"
+        },
+        {
+            "query": "Найди товар с ID 1",
+            "description": "Get product by ID"
+        },
+        {
+            "query": "Посчитай скидку 15% на товар с ID 1",
+            "description": "Calculate 15% discount on product with ID 1"
+        }
+    ]
+})
+
+
 @app.get("/api/v1/examples", tags=["Examples"])
-async def get_examples() -> dict[str, Any]:
+async def get_examples() -> Response:
     """
     Get example queries that can be used with the agent.
     
     Returns:
         List of example queries
     """
-    return {
-        "examples": [
-            {
-                "query": "Покажи все продукты",
-                "description": "Get all products"
-            },
-            {
-                "query": "Покажи все продукты в категории Электроника",
-                "description": "Get products in Electronics category"
-            },
-            {
-                "query": "Какая средняя цена продуктов?",
-                "description": "Get average product price"
-            },
-            {
-                "query": "Найди товар с ID 1",
-                "description": "Get product by ID"
-            },
-            {
-                "query": "Посчитай скидку 15% на товар с ID 1",
-                "description": "Calculate 15% discount on product with ID 1"
-            }
-        ]
-    }
+    return Response(content=_EXAMPLES_BYTES, media_type="application/json")
 
 
 # ============================================================================
@@ -185,12 +282,30 @@ async def value_error_handler(request, exc):
 async def startup_event():
     """Handle startup events."""
     logger.info("API startup")
+    
+    # Build the agent graph before the first request arrives
+    get_agent()
+    
+    # Start one MCP server process shared by all requests
+    app.state.mcp_client = None
+    command = os.getenv("MCP_SERVER_COMMAND")
+    if command:
+        try:
+            app.state.mcp_client = await MCPClient.start(*shlex.split(command))
+            logger.info(f"Connected to MCP server: {command}")
+        except Exception as e:
+            logger.error(f"Failed to start MCP server: {str(e)}")
 
 
 @app.on_event("shutdown")
 async def shutdown_event():
     """Handle shutdown events."""
     logger.info("API shutdown")
+    
+    mcp_client = getattr(app.state, "mcp_client", None)
+    if mcp_client is not None:
+        await mcp_client.close()
+        app.state.mcp_client = None
 
 
 # ============================================================================
@@ -9,6 +9,7 @@ from pathlib import Path
 from typing import Any
 import logging
 
+import numpy as np
 import mcp.server.fastmcp as mcp
 
 # Configure logging
@@ -22,6 +23,26 @@ server = mcp.FastMCP("product-server")
 PRODUCTS_FILE = Path(__file__).parent.parent / "data" / "products.json"
 products_data = []
 
+# Index of products_data by product ID
+_by_id: dict[int, dict[str, Any]] = {}
+
+# Column-oriented copies of the fields get_statistics aggregates,
+# kept in sync with products_data
+_prices = np.empty(0, dtype=np.float64)
+_in_stock = np.empty(0, dtype=bool)
+_categories: set[str] = set()
+
+
+def _build_indexes() -> None:
+    """Rebuild the ID index and statistics columns from products_data."""
+    global _prices, _in_stock
+    _by_id.clear()
+    _by_id.update((p["id"], p) for p in products_data)
+    _prices = np.fromiter((p["price"] for p in products_data), dtype=np.float64, count=len(products_data))
+    _in_stock = np.fromiter((p.get("in_stock", False) for p in products_data), dtype=bool, count=len(products_data))
+    _categories.clear()
+    _categories.update(p.get("category", "Unknown") for p in products_data)
+
 
 def load_products() -> list[dict[str, Any]]:
     """Load products from JSON file."""
@@ -29,21 +50,24 @@ def load_products() -> list[dict[str, Any]]:
     if not products_data and PRODUCTS_FILE.exists():
         with open(PRODUCTS_FILE, "r", encoding="utf-8") as f:
             products_data = json.load(f)
+        _build_indexes()
     return products_data
 
 
 def save_products() -> None:
-    """Save products to JSON file."""
+    """Save products to JSON file atomically."""
     os.makedirs(PRODUCTS_FILE.parent, exist_ok=True)
-    with open(PRODUCTS_FILE, "w", encoding="utf-8") as f:
+    tmp_file = PRODUCTS_FILE.with_name(PRODUCTS_FILE.name + ".tmp")
+    with open(tmp_file, "w", encoding="utf-8") as f:
         json.dump(products_data, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_file, PRODUCTS_FILE)
 
 
 def get_next_product_id() -> int:
     """Get next available product ID."""
-    if not products_data:
+    if not _by_id:
         return 1
-    return max(p["id"] for p in products_data) + 1
+    return max(_by_id) + 1
 
 
 @server.tool()
@@ -87,14 +111,14 @@ def get_product(product_id: int) -> dict[str, Any]:
     Raises:
         ValueError: If product not found
     """
-    products = load_products()
+    load_products()
     
-    for product in products:
-        if product["id"] == product_id:
-            return {
-                "success": True,
-                "product": product
-            }
+    product = _by_id.get(product_id)
+    if product is not None:
+        return {
+            "success": True,
+            "product": product
+        }
     
     raise ValueError(f"Product with ID {product_id} not found")
 
@@ -113,7 +137,8 @@ def add_product(name: str, price: float, category: str, in_stock: bool = True) -
     Returns:
         The newly created product with assigned ID
     """
-    products = load_products()
+    global _prices, _in_stock
+    load_products()
     
     new_product = {
         "id": get_next_product_id(),
@@ -123,9 +148,11 @@ def add_product(name: str, price: float, category: str, in_stock: bool = True) -
         "in_stock": in_stock
     }
     
-    products.append(new_product)
-    products_data.clear()
-    products_data.extend(products)
+    products_data.append(new_product)
+    _by_id[new_product["id"]] = new_product
+    _prices = np.append(_prices, price)
+    _in_stock = np.append(_in_stock, in_stock)
+    _categories.add(category)
     save_products()
     
     logger.info(f"Added new product: {name} (ID: {new_product['id']})")
@@ -155,19 +182,19 @@ def get_statistics() -> dict[str, Any]:
             "price_range": {"min": 0, "max": 0}
         }
     
-    prices = [p["price"] for p in products]
-    categories = list(set(p.get("category", "Unknown") for p in products))
-    in_stock_count = sum(1 for p in products if p.get("in_stock", False))
+    # Aggregates run over the contiguous columns, not the product dicts
+    in_stock_count = int(_in_stock.sum())
     
     return {
         "total_products": len(products),
-        "average_price": sum(prices) / len(prices),
+        "average_price": float(_prices.mean()),
         "in_stock_count": in_stock_count,
         "out_of_stock_count": len(products) - in_stock_count,
-        "categories": categories,
+        "categories": list(_categories),
+        # Index back into the products so prices keep their original type
         "price_range": {
-            "min": min(prices),
-            "max": max(prices)
+            "min": products[int(_prices.argmin())]["price"],
+            "max": products[int(_prices.argmax())]["price"]
         }
     }
 
@@ -177,5 +204,5 @@ if __name__ == "__main__":
     load_products()
     logger.info(f"Loaded {len(products_data)} products")
     
-    # Start the server
-    server.run(port=3001)
+    # Serve over stdio; the API spawns this module as a child process
+    server.run()
@@ -0,0 +1,106 @@
+"""
+Shared test fixtures
+"""
+
+import re
+from pathlib import Path
+
+import pytest
+import pytest_asyncio
+from asgi_lifespan import LifespanManager
+from httpx import ASGITransport, AsyncClient
+from app.main import app, get_agent_graph
+
+
+def pytest_addoption(parser):
+    """Add command line options."""
+    parser.addoption(
+        "--run-live",
+        action="store_true",
+        default=False,
+        help="run tests that go through the real agent pipeline"
+    )
+    parser.addoption(
+        "--profile",
+        action="store_true",
+        default=False,
+        help="profile each test with pyinstrument and write HTML reports to profiles/"
+    )
+
+
+def pytest_configure(config):
+    """Register custom markers."""
+    config.addinivalue_line("markers", "live: test runs the real agent pipeline (needs --run-live)")
+
+
+def pytest_collection_modifyitems(config, items):
+    """Skip live tests unless --run-live and benchmarks unless --benchmark-only is given."""
+    run_live = config.getoption("--run-live")
+    run_benchmarks = config.getoption("--benchmark-only", default=False)
+    skip_live = pytest.mark.skip(reason="needs --run-live")
+    skip_benchmark = pytest.mark.skip(reason="needs --benchmark-only")
+    for item in items:
+        if "live" in item.keywords and not run_live:
+            item.add_marker(skip_live)
+        if "benchmark" in getattr(item, "fixturenames", ()) and not run_benchmarks:
+            item.add_marker(skip_benchmark)
+
+
+# Directory for per-test pyinstrument reports written with --profile
+PROFILES_DIR = Path("profiles")
+
+
+@pytest.fixture(autouse=True)
+def auto_profile(request):
+    """Profile the test with pyinstrument when --profile is given."""
+    if not request.config.getoption("--profile"):
+        yield
+        return
+    
+    from pyinstrument import Profiler
+    
+    profiler = Profiler(async_mode="enabled")
+    profiler.start()
+    yield
+    profiler.stop()
+    
+    PROFILES_DIR.mkdir(exist_ok=True)
+    filename = re.sub(r"[^\w.\[\]-]", "_", request.node.nodeid)
+    (PROFILES_DIR / f"{filename}.html").write_text(profiler.output_html(), encoding="utf-8")
+
+
+class FakeAgent:
+    """Stand-in for the compiled agent that answers without running tools."""
+    
+    async def ainvoke(self, state: dict, config: dict | None = None) -> dict:
+        return {**state, "response": "ok"}
+
+
+@pytest.fixture(scope="session", autouse=True)
+def fake_agent():
+    """Route API requests to a fake agent so endpoint tests skip the agent pipeline."""
+    app.dependency_overrides[get_agent_graph] = FakeAgent
+    yield
+    app.dependency_overrides.clear()
+
+
+@pytest.fixture
+def real_agent(fake_agent):
+    """Let a live test reach the real agent despite the session-wide fake."""
+    fake = app.dependency_overrides.pop(get_agent_graph)
+    yield
+    app.dependency_overrides[get_agent_graph] = fake
+
+
+@pytest_asyncio.fixture(scope="session")
+async def app_lifespan():
+    """Run the app startup and shutdown events once per session; ASGITransport does not."""
+    async with LifespanManager(app):
+        yield
+
+
+@pytest_asyncio.fixture(scope="session")
+async def client(app_lifespan):
+    """Create async test client calling the ASGI app in-process, shared by the whole session."""
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as c:
+        yield c
@@ -2,16 +2,69 @@
 Tests for LangGraph Agent
 """
 
+import asyncio
+import json
+import sys
+from pathlib import Path
+
 import pytest
 from app.agent import (
     run_agent,
     calculator,
+    calculator_batch,
     formatter,
     create_agent,
-    process_user_query
+    get_agent,
+    process_user_query,
+    detect_intents,
+    extract_product_id,
+    MCPClient
 )
 
 
+MCP_SERVER_SCRIPT = Path(__file__).parent.parent / "mcp_server" / "mcp_server.py"
+
+
+class FakeMCPStream:
+    """In-memory stdin/stdout pair that answers each request with the next result."""
+    
+    def __init__(self, results: list):
+        self.requests = []
+        self._results = iter(results)
+        self._lines = asyncio.Queue()
+    
+    def write(self, data: bytes) -> None:
+        request = json.loads(data)
+        self.requests.append(request)
+        if "id" not in request:
+            # Notifications get no response
+            return
+        result = next(self._results, None)
+        if result is None:
+            # Out of scripted results: simulate a server that never answers
+            return
+        response = {"jsonrpc": "2.0", "id": request["id"], "result": result}
+        self._lines.put_nowait(json.dumps(response).encode() + b"\n")
+    
+    async def drain(self) -> None:
+        pass
+    
+    async def readline(self) -> bytes:
+        return await self._lines.get()
+
+
+class FakeMCPProcess:
+    """Stand-in for the MCP subprocess."""
+    
+    def __init__(self, results: list):
+        self.stdin = self.stdout = FakeMCPStream(results)
+        self.returncode = None
+    
+    @property
+    def requests(self) -> list[dict]:
+        return self.stdin.requests
+
+
 class TestCalculatorTool:
     """Tests for the calculator tool."""
     
@@ -21,6 +74,11 @@ class TestCalculatorTool:
         assert "7500" in result
         assert "=" in result
     
+    def test_negative_percentage(self):
+        """Test negative percentages are calculated."""
+        result = calculator("-5% of 100")
+        assert "= -5.0" in result
+    
     def test_simple_arithmetic(self):
         """Test simple arithmetic."""
         result = calculator("100 + 50")
@@ -30,6 +88,25 @@ class TestCalculatorTool:
         """Test error handling for invalid expressions."""
         result = calculator("invalid expression !!!!")
         assert "Error" in result
+    
+    def test_rejects_non_arithmetic(self):
+        """Test that names and calls are not evaluated."""
+        result = calculator("__import__('os').getcwd()")
+        assert "Error" in result
+
+
+class TestCalculatorBatch:
+    """Tests for vectorized percentage calculation."""
+    
+    def test_single_percent_over_amounts(self):
+        """Test one percentage applied to many amounts."""
+        result = calculator_batch(15, [50000, 1000])
+        assert result.tolist() == pytest.approx([7500.0, 150.0])
+    
+    def test_elementwise_percents(self):
+        """Test percentages paired with amounts."""
+        result = calculator_batch([10, 50], [200, 10])
+        assert result.tolist() == pytest.approx([20.0, 5.0])
 
 
 class TestFormatterTool:
@@ -58,6 +135,209 @@ class TestFormatterTool:
         assert "Unknown format type" in result
 
 
+class TestIntentRouting:
+    """Tests for intent detection."""
+    
+    def test_single_intent(self):
+        """Test query mapped to one intent."""
+        assert detect_intents("какая средняя цена продуктов?") == {"stats"}
+    
+    def test_multiple_intents(self):
+        """Test compound query yields every intent it mentions."""
+        intents = detect_intents("покажи все продукты в категории электроника")
+        assert intents == {"list", "category"}
+    
+    def test_keywords_match_whole_words(self):
+        """Test keywords inside longer words do not trigger intents."""
+        assert detect_intents("calculate additional 10% discount") == {"calc"}
+        assert detect_intents("valid video address") == set()
+    
+    def test_no_intent(self):
+        """Test unrelated query yields no intents."""
+        assert detect_intents("привет, как дела?") == set()
+    
+    def test_extract_product_id(self):
+        """Test product ID extraction in supported spellings."""
+        assert extract_product_id("найди товар с id 1") == 1
+        assert extract_product_id("product id=42") == 42
+        assert extract_product_id("товар номер 7") == 7
+        assert extract_product_id("valid 5") is None
+    
+    def test_extract_product_id_ignores_oversized_ids(self):
+        """Test IDs too long for a 64-bit integer are not extracted."""
+        assert extract_product_id("найди товар с id " + "9" * 19) is None
+        assert extract_product_id("найди товар с id " + "1" * 5000) is None
+        assert extract_product_id("id " + "9" * 18) == int("9" * 18)
+
+
+class TestMCPClientCache:
+    """Tests for caching of MCP tool results."""
+    
+    def test_read_only_tool_is_cached(self):
+        """Test repeated read-only calls hit the server once."""
+        process = FakeMCPProcess([{"total": 3}])
+        client = MCPClient(process)
+        
+        async def scenario():
+            first = await client.call_tool("list_products", {"category": "Электроника"})
+            second = await client.call_tool("list_products", {"category": "Электроника"})
+            return first, second
+        
+        first, second = asyncio.run(scenario())
+        
+        assert first == second == {"total": 3}
+        assert len(process.requests) == 1
+        assert client.cache.hits == 1
+        assert client.cache.misses == 1
+    
+    def test_different_args_are_cached_separately(self):
+        """Test cache keys include tool arguments."""
+        process = FakeMCPProcess([{"id": 1}, {"id": 2}])
+        client = MCPClient(process)
+        
+        async def scenario():
+            return [
+                await client.call_tool("get_product", {"product_id": 1}),
+                await client.call_tool("get_product", {"product_id": 2})
+            ]
+        
+        assert asyncio.run(scenario()) == [{"id": 1}, {"id": 2}]
+        assert len(process.requests) == 2
+    
+    def test_write_tool_clears_cache(self):
+        """Test write tools invalidate cached results."""
+        process = FakeMCPProcess([{"total_products": 1}, {"success": True}, {"total_products": 2}])
+        client = MCPClient(process)
+        
+        async def scenario():
+            await client.call_tool("get_statistics", {})
+            await client.call_tool("add_product", {"name": "Мышь", "price": 500, "category": "Электроника"})
+            return await client.call_tool("get_statistics", {})
+        
+        result = asyncio.run(scenario())
+        
+        assert result == {"total_products": 2}
+        assert len(process.requests) == 3
+    
+    def test_error_results_are_not_cached(self):
+        """Test tool failures reported as results are fetched again."""
+        error = {"content": [{"type": "text", "text": "Product with ID 1 not found"}], "isError": True}
+        process = FakeMCPProcess([error, {"id": 1}])
+        client = MCPClient(process)
+        
+        async def scenario():
+            return [await client.call_tool("get_product", {"product_id": 1}) for _ in range(2)]
+        
+        assert asyncio.run(scenario()) == [error, {"id": 1}]
+        assert len(process.requests) == 2
+        assert len(client.cache) == 1
+    
+    def test_cache_evicts_least_recently_used(self):
+        """Test cache respects its maximum size."""
+        process = FakeMCPProcess([{"id": 1}, {"id": 2}, {"id": 1}])
+        client = MCPClient(process, cache_maxsize=1)
+        
+        async def scenario():
+            for product_id in (1, 2, 1):
+                await client.call_tool("get_product", {"product_id": product_id})
+        
+        asyncio.run(scenario())
+        
+        assert len(client.cache) == 1
+        assert len(process.requests) == 3
+    
+    def test_concurrent_calls_share_one_pipe(self):
+        """Test concurrent calls are matched to responses by request id."""
+        process = FakeMCPProcess([{"id": 1}, {"id": 2}])
+        client = MCPClient(process)
+        
+        async def scenario():
+            return await asyncio.gather(
+                client.call_tool("get_product", {"product_id": 1}),
+                client.call_tool("get_product", {"product_id": 2})
+            )
+        
+        assert asyncio.run(scenario()) == [{"id": 1}, {"id": 2}]
+    
+    def test_raw_call_returns_json_bytes(self):
+        """Test raw calls return the encoded result and cache it."""
+        process = FakeMCPProcess([{"products": [], "total": 0}])
+        client = MCPClient(process)
+        
+        async def scenario():
+            return [await client.call_tool_raw("list_products", {}) for _ in range(2)]
+        
+        first, second = asyncio.run(scenario())
+        assert json.loads(first) == {"products": [], "total": 0}
+        assert first is second
+        assert len(process.requests) == 1
+    
+    def test_unanswered_call_times_out(self):
+        """Test calls fail instead of waiting forever for a response."""
+        client = MCPClient(FakeMCPProcess([]), timeout=0.01)
+        
+        with pytest.raises(TimeoutError):
+            asyncio.run(client.call_tool("get_statistics", {}))
+        assert client._pending == {}
+
+
+class TestBulkDiscount:
+    """Tests for discount calculation over product listings."""
+    
+    def test_discount_applied_to_listed_products(self):
+        """Test percentage query over a listing yields a discount per product."""
+        products = [{"id": 1, "price": 50000}, {"id": 2, "price": 1000}]
+        listing = {"products": products, "total": 2}
+        # CallToolResult shape returned by FastMCP
+        result = {
+            "content": [{"type": "text", "text": json.dumps(listing)}],
+            "structuredContent": listing,
+            "isError": False
+        }
+        process = FakeMCPProcess([result])
+        client = MCPClient(process)
+        query = "Посчитай скидку 10% на все продукты"
+        response = asyncio.run(process_user_query(query, client))
+        assert '"id":1,"percent":10.0,"amount":5000.0' in response
+        assert '"id":2,"percent":10.0,"amount":100.0' in response
+    
+    def test_discount_from_text_only_result(self):
+        """Test listings from servers without structuredContent are read from text."""
+        listing = {"products": [{"id": 1, "price": 50000}], "total": 1}
+        result = {"content": [{"type": "text", "text": json.dumps(listing)}], "isError": False}
+        client = MCPClient(FakeMCPProcess([result]))
+        query = "Посчитай скидку 10% на все продукты"
+        response = asyncio.run(process_user_query(query, client))
+        assert '"id":1,"percent":10.0,"amount":5000.0' in response
+
+
+class TestMCPClientHandshake:
+    """Tests for the MCP initialization handshake."""
+    
+    def test_initialize_sends_request_and_notification(self):
+        """Test initialize is answered and followed by an initialized notification."""
+        process = FakeMCPProcess([{"protocolVersion": "2024-11-05"}])
+        client = MCPClient(process)
+        
+        result = asyncio.run(client.initialize())
+        
+        assert result == {"protocolVersion": "2024-11-05"}
+        assert [r["method"] for r in process.requests] == ["initialize", "notifications/initialized"]
+    
+    def test_start_spawns_real_server(self):
+        """Test the MCP server starts over stdio and answers a tool call."""
+        async def scenario():
+            client = await MCPClient.start(sys.executable, str(MCP_SERVER_SCRIPT), timeout=10.0)
+            try:
+                return await client.call_tool("get_statistics", {})
+            finally:
+                await client.close()
+        
+        result = asyncio.run(scenario())
+        assert result["isError"] is False
+        assert "total_products" in json.loads(result["content"][0]["text"])
+
+
 class TestAgentProcessing:
     """Tests for agent processing."""
     
@@ -66,27 +346,46 @@ class TestAgentProcessing:
         agent = create_agent()
         assert agent is not None
     
+    def test_agent_is_reused(self):
+        """Test that the compiled agent is built once and shared."""
+        assert get_agent() is get_agent()
+    
     def test_query_processing_list_products(self):
         """Test processing query for listing products."""
         query = "Покажи все продукты"
-        response = process_user_query(query)
+        response = asyncio.run(process_user_query(query))
         assert response is not None
         assert isinstance(response, str)
     
     def test_query_processing_statistics(self):
         """Test processing query for statistics."""
         query = "Какая средняя цена продуктов?"
-        response = process_user_query(query)
+        response = asyncio.run(process_user_query(query))
         assert response is not None
         assert isinstance(response, str)
     
     def test_query_processing_category_filter(self):
         """Test processing query with category filter."""
         query = "Покажи все продукты в категории Электроника"
-        response = process_user_query(query)
+        response = asyncio.run(process_user_query(query))
         assert response is not None
         assert "Электроника" in response or "Electronics" in response or response is not None
     
+    def test_query_processing_word_containing_keyword(self):
+        """Test a calculation mentioning "additional" is not routed to add."""
+        response = asyncio.run(process_user_query("calculate additional 10% discount"))
+        assert response.startswith("Calculation:")
+    
+    def test_query_processing_multiple_intents(self):
+        """Test compound query issues each independent tool call."""
+        process = FakeMCPProcess([{"total_products": 2}, {"products": []}])
+        client = MCPClient(process)
+        query = "Статистика и товары в категории Электроника"
+        response = asyncio.run(process_user_query(query, client))
+        assert "Statistics" in response
+        assert "Products in Электроника" in response
+        assert {r["params"]["name"] for r in process.requests} == {"get_statistics", "list_products"}
+    
     def test_agent_run(self):
         """Test running the agent with a query."""
         query = "Покажи все продукты"
@@ -111,6 +410,12 @@ class TestAgentIntegration:
         response = run_agent(query)
         assert response is not None
     
+    def test_agent_with_oversized_product_id_query(self):
+        """Test agent answers instead of failing on an absurdly long ID."""
+        query = "Найди товар с ID " + "1" * 5000
+        response = run_agent(query)
+        assert isinstance(response, str)
+    
     def test_agent_with_unknown_query(self):
         """Test agent handling unknown query."""
         query = "Привет, как дела?"
@@ -2,120 +2,185 @@
 Tests for FastAPI Application
 """
 
+import json
+
 import pytest
-from fastapi.testclient import TestClient
+import pytest_asyncio
 from app.main import app
 
+# All tests share the session event loop the async client lives on
+pytestmark = pytest.mark.asyncio(scope="session")
+
+# Queries covering each kind of request the agent supports
+QUERIES = {
+    "products": "Покажи все продукты",
+    "statistics": "Какая средняя цена продуктов?",
+    "category": "Покажи все продукты в категории Электроника",
+    "calculation": "Посчитай скидку 15% на товар с ID 1",
+    "empty": ""
+}
+
+# Request bodies encoded once and reused by every call
+BODIES = {name: json.dumps({"query": q}).encode() for name, q in QUERIES.items()}
+JSON_HEADERS = {"Content-Type": "application/json"}
+
+
+@pytest.fixture(scope="module")
+def prebuilt(client):
+    """Build requests once so tests send them without re-merging URL and headers."""
+    requests = {
+        name: client.build_request(
+            "POST",
+            "/api/v1/agent/query",
+            content=body,
+            headers=JSON_HEADERS
+        )
+        for name, body in BODIES.items()
+    }
+    requests["health"] = client.build_request("GET", "/health")
+    requests["examples"] = client.build_request("GET", "/api/v1/examples")
+    return requests
+
 
-@pytest.fixture
-def client():
-    """Create test client."""
-    return TestClient(app)
+@pytest_asyncio.fixture(scope="module")
+async def health_response(client, prebuilt):
+    """Fetch and parse /health once for all tests that only read the response."""
+    response = await client.send(prebuilt["health"])
+    return response, response.json()
 
 
 class TestHealthEndpoint:
     """Tests for health check endpoint."""
     
-    def test_health_check(self, client):
+    async def test_health_check(self, health_response):
         """Test health check endpoint returns 200."""
-        response = client.get("/health")
+        response, data = health_response
         assert response.status_code == 200
-        assert response.json()["status"] == "healthy"
+        assert data["status"] == "healthy"
     
-    def test_health_check_structure(self, client):
+    async def test_health_check_structure(self, health_response):
         """Test health check response structure."""
-        response = client.get("/health")
-        data = response.json()
+        _, data = health_response
         assert "status" in data
         assert "message" in data
 
 
+@pytest_asyncio.fixture(scope="module")
+async def basic_query_response(client, prebuilt):
+    """Post and parse the basic query once for all tests that only read the response."""
+    response = await client.send(prebuilt["products"])
+    return response, response.json()
+
+
 class TestQueryEndpoint:
     """Tests for agent query endpoint."""
     
-    def test_query_endpoint_basic(self, client):
+    async def test_query_endpoint_basic(self, basic_query_response):
         """Test basic query endpoint."""
-        response = client.post(
-            "/api/v1/agent/query",
-            json={"query": "Покажи все продукты"}
-        )
+        response, data = basic_query_response
         assert response.status_code == 200
-        assert "response" in response.json()
+        assert "response" in data
+        assert data["status"] == "success"
     
-    def test_query_endpoint_structure(self, client):
+    async def test_query_endpoint_structure(self, basic_query_response):
         """Test query response structure."""
-        response = client.post(
-            "/api/v1/agent/query",
-            json={"query": "Покажи все продукты"}
-        )
-        data = response.json()
+        _, data = basic_query_response
         assert "query" in data
         assert "response" in data
         assert "status" in data
         assert data["status"] == "success"
     
-    def test_query_endpoint_with_statistics(self, client):
-        """Test query endpoint with statistics request."""
-        response = client.post(
-            "/api/v1/agent/query",
-            json={"query": "Какая средняя цена продуктов?"}
-        )
+    @pytest.mark.parametrize("name", ["statistics", "category", "calculation"])
+    async def test_query_success(self, client, prebuilt, name):
+        """Test query endpoint succeeds for other supported queries."""
+        response = await client.send(prebuilt[name])
         assert response.status_code == 200
         data = response.json()
+        assert "response" in data
         assert data["status"] == "success"
     
-    def test_query_endpoint_with_category(self, client):
-        """Test query endpoint with category filter."""
-        response = client.post(
-            "/api/v1/agent/query",
-            json={"query": "Покажи все продукты в категории Электроника"}
-        )
-        assert response.status_code == 200
-        assert response.json()["status"] == "success"
+    async def test_query_endpoint_empty_query(self, client, prebuilt):
+        """Test query endpoint with empty query."""
+        response = await client.send(prebuilt["empty"])
+        assert response.status_code == 422  # Validation error
     
-    def test_query_endpoint_with_calculation(self, client):
-        """Test query endpoint with calculation."""
-        response = client.post(
+    async def test_query_endpoint_missing_query(self, client):
+        """Test query endpoint with missing query field."""
+        response = await client.post(
             "/api/v1/agent/query",
-            json={"query": "Посчитай скидку 15% на товар с ID 1"}
+            json={}
         )
+        assert response.status_code == 422  # Validation error
+
+
+@pytest.mark.live
+@pytest.mark.usefixtures("real_agent")
+class TestQueryEndpointLive:
+    """Tests for agent query endpoint against the real agent."""
+    
+    @pytest.mark.parametrize("name", ["products", "statistics", "category", "calculation"])
+    async def test_query_success(self, client, prebuilt, name):
+        """Test real agent answers supported queries."""
+        response = await client.send(prebuilt[name])
         assert response.status_code == 200
         data = response.json()
         assert data["status"] == "success"
+        assert data["response"] != "ok"
+
+
+class TestBatchEndpoint:
+    """Tests for batch query endpoint."""
     
-    def test_query_endpoint_empty_query(self, client):
-        """Test query endpoint with empty query."""
-        response = client.post(
-            "/api/v1/agent/query",
-            json={"query": ""}
+    async def test_batch_endpoint(self, client):
+        """Test batch endpoint answers every query in order."""
+        queries = ["Покажи все продукты", "Какая средняя цена продуктов?"]
+        response = await client.post(
+            "/api/v1/agent/batch",
+            json={"queries": queries}
+        )
+        assert response.status_code == 200
+        results = response.json()["results"]
+        assert [r["query"] for r in results] == queries
+        assert all(r["status"] == "success" for r in results)
+    
+    async def test_batch_endpoint_empty(self, client):
+        """Test batch endpoint rejects an empty batch."""
+        response = await client.post(
+            "/api/v1/agent/batch",
+            json={"queries": []}
         )
         assert response.status_code == 422  # Validation error
     
-    def test_query_endpoint_missing_query(self, client):
-        """Test query endpoint with missing query field."""
-        response = client.post(
-            "/api/v1/agent/query",
-            json={}
+    async def test_batch_endpoint_empty_query(self, client):
+        """Test batch endpoint rejects empty queries."""
+        response = await client.post(
+            "/api/v1/agent/batch",
+            json={"queries": ["Покажи все продукты", ""]}
         )
         assert response.status_code == 422  # Validation error
 
 
+@pytest_asyncio.fixture(scope="module")
+async def examples_response(client, prebuilt):
+    """Fetch and parse /api/v1/examples once for all tests that only read the response."""
+    response = await client.send(prebuilt["examples"])
+    return response, response.json()
+
+
 class TestExamplesEndpoint:
     """Tests for examples endpoint."""
     
-    def test_examples_endpoint(self, client):
+    async def test_examples_endpoint(self, examples_response):
         """Test examples endpoint returns list."""
-        response = client.get("/api/v1/examples")
+        response, data = examples_response
         assert response.status_code == 200
-        data = response.json()
         assert "examples" in data
         assert isinstance(data["examples"], list)
         assert len(data["examples"]) > 0
     
-    def test_examples_structure(self, client):
+    async def test_examples_structure(self, examples_response):
         """Test examples response structure."""
-        response = client.get("/api/v1/examples")
-        data = response.json()
+        _, data = examples_response
         for example in data["examples"]:
             assert "query" in example
             assert "description" in example
@@ -124,51 +189,48 @@ class TestExamplesEndpoint:
 class TestCORSHeaders:
     """Tests for CORS headers."""
     
-    def test_cors_headers(self, client):
+    async def test_cors_headers(self, health_response):
         """Test CORS headers are present."""
-        response = client.get("/health")
         # FastAPI adds CORS headers when middleware is configured
         # Just verify the endpoint works
+        response, _ = health_response
         assert response.status_code == 200
 
 
 class TestErrorHandling:
     """Tests for error handling."""
     
-    def test_invalid_json(self, client):
+    async def test_invalid_json(self, client):
         """Test handling of invalid JSON."""
-        response = client.post(
+        response = await client.post(
             "/api/v1/agent/query",
             content="invalid json",
             headers={"Content-Type": "application/json"}
         )
         assert response.status_code == 422
     
-    def test_wrong_method(self, client):
+    async def test_wrong_method(self, client):
         """Test wrong HTTP method."""
-        response = client.get("/api/v1/agent/query")
+        response = await client.get("/api/v1/agent/query")
         assert response.status_code == 405  # Method Not Allowed
 
 
+# Registered (path, method) pairs, read from the route table without any requests
+ROUTES = {(route.path, method) for route in app.routes for method in getattr(route, "methods", ())}
+
+
 class TestEndpoints:
     """General endpoint tests."""
     
-    def test_api_endpoints_exist(self, client):
-        """Test that all main endpoints exist."""
-        endpoints = [
-            ("/health", "GET"),
-            ("/api/v1/agent/query", "POST"),
-            ("/api/v1/examples", "GET"),
-        ]
-        
-        for path, method in endpoints:
-            if method == "GET":
-                response = client.get(path)
-            else:
-                response = client.post(path, json={"query": "test"})
-            
-            # Should not be 404
-            assert response.status_code != 404
+    @pytest.mark.parametrize("path,method", [
+        ("/health", "GET"),
+        ("/api/v1/agent/query", "POST"),
+        ("/api/v1/agent/batch", "POST"),
+        ("/api/v1/examples", "GET"),
+    ])
+    async def test_api_endpoint_exists(self, path, method):
+        """Test that the endpoint is registered."""
+        assert (path, method) in ROUTES
 
 
 if __name__ == "__main__":
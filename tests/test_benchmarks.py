@@ -0,0 +1,32 @@
+"""
+Benchmarks for lightweight API endpoints
+"""
+
+import pytest
+from fastapi.testclient import TestClient
+from app.main import app
+
+
+@pytest.fixture(scope="module")
+def sync_client():
+    """Create synchronous test client; pytest-benchmark calls its target synchronously."""
+    with TestClient(app) as c:
+        yield c
+
+
+class TestEndpointBenchmarks:
+    """Benchmarks for endpoints that do not run the agent."""
+    
+    def test_health_bench(self, benchmark, sync_client):
+        """Benchmark health check endpoint."""
+        response = benchmark(sync_client.get, "/health")
+        assert response.status_code == 200
+    
+    def test_examples_bench(self, benchmark, sync_client):
+        """Benchmark examples endpoint."""
+        response = benchmark(sync_client.get, "/api/v1/examples")
+        assert response.status_code == 200
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "--benchmark-only", "--benchmark-columns=min,mean,median"])
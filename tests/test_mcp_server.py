@@ -0,0 +1,94 @@
+"""
+Tests for MCP Server tools
+"""
+
+import json
+
+import pytest
+from mcp_server import mcp_server
+
+
+PRODUCTS = [
+    {"id": 1, "name": "Ноутбук", "price": 50000, "category": "Электроника", "in_stock": True},
+    {"id": 3, "name": "Книга", "price": 1000, "category": "Книги", "in_stock": False}
+]
+
+
+@pytest.fixture
+def products_file(tmp_path, monkeypatch):
+    """Point the server at a temporary catalogue and reload it from disk."""
+    path = tmp_path / "products.json"
+    path.write_text(json.dumps(PRODUCTS, ensure_ascii=False), encoding="utf-8")
+    monkeypatch.setattr(mcp_server, "PRODUCTS_FILE", path)
+    monkeypatch.setattr(mcp_server, "products_data", [])
+    mcp_server.load_products()
+    yield path
+    # Restore the original catalogue together with the indexes built from it
+    monkeypatch.undo()
+    mcp_server._build_indexes()
+
+
+class TestGetProduct:
+    """Tests for product lookup by ID."""
+    
+    def test_get_existing_product(self, products_file):
+        """Test loaded products are found by ID."""
+        result = mcp_server.get_product(3)
+        assert result["success"] is True
+        assert result["product"]["name"] == "Книга"
+    
+    def test_get_missing_product(self, products_file):
+        """Test unknown IDs raise ValueError."""
+        with pytest.raises(ValueError):
+            mcp_server.get_product(2)
+
+
+class TestAddProduct:
+    """Tests for adding products."""
+    
+    def test_add_product_assigns_next_id(self, products_file):
+        """Test new product gets the next ID after the largest one."""
+        result = mcp_server.add_product("Мышь", 500, "Электроника")
+        assert result["product"]["id"] == 4
+        assert mcp_server.get_product(4)["product"]["name"] == "Мышь"
+    
+    def test_add_product_saves_catalogue(self, products_file):
+        """Test the catalogue is written to disk without leftover temp files."""
+        mcp_server.add_product("Мышь", 500, "Электроника")
+        saved = json.loads(products_file.read_text(encoding="utf-8"))
+        assert [p["id"] for p in saved] == [1, 3, 4]
+        assert [p.name for p in products_file.parent.iterdir()] == ["products.json"]
+
+
+class TestGetStatistics:
+    """Tests for product statistics."""
+    
+    def test_statistics_of_loaded_products(self, products_file):
+        """Test statistics over the catalogue read from disk."""
+        stats = mcp_server.get_statistics()
+        assert stats["total_products"] == 2
+        assert stats["average_price"] == 25500
+        assert stats["in_stock_count"] == 1
+        assert stats["out_of_stock_count"] == 1
+        assert sorted(stats["categories"]) == ["Книги", "Электроника"]
+        assert stats["price_range"] == {"min": 1000, "max": 50000}
+    
+    def test_statistics_follow_added_products(self, products_file):
+        """Test statistics include products added after loading."""
+        mcp_server.add_product("Мышь", 500, "Аксессуары", in_stock=True)
+        stats = mcp_server.get_statistics()
+        assert stats["total_products"] == 3
+        assert stats["average_price"] == pytest.approx(51500 / 3)
+        assert stats["in_stock_count"] == 2
+        assert "Аксессуары" in stats["categories"]
+        assert stats["price_range"] == {"min": 500, "max": 50000}
+    
+    def test_price_range_keeps_price_type(self, products_file):
+        """Test integer prices are reported as integers."""
+        price_range = mcp_server.get_statistics()["price_range"]
+        assert isinstance(price_range["min"], int)
+        assert isinstance(price_range["max"], int)
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])